@@ -0,0 +1,114 @@
+"""
+Parse+answer latency for the ask assistant.
+
+Seeds a throwaway database, then times models.ask_agent over a corpus of sample
+questions twice: a cold pass (parse and plan caches empty) and a warm pass.
+
+    python benchmarks/bench_ask.py [--questions 3000] [--contacts 200] [--loans 5000]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from onepaisa import intents, models
+from onepaisa.db import get_conn
+
+TEMPLATES = [
+    "how much I gave others {window}",
+    "how much did I lend to {contact} {window}",
+    "how much did I borrow from {contact} {window}",
+    "how much I borrowed {window} via {account}",
+    "how much I spent on {category} {window}",
+    "how much did I spend via {account} {window}",
+    "does {contact} owe me",
+    "how much do I owe {contact}",
+    "outstanding tagged {tag}",
+    "who owes me tagged {tag}",
+    "how much I gave to contacts tagged {tag} {window}",
+]
+WINDOWS = [
+    "this week", "last week", "this month", "last month", "this year", "today", "yesterday",
+    "last 30 days", "since 2025-01-01", "between 2025-01-01 and 2025-03-31", "ever",
+]
+ACCOUNTS = ["Wallet", "Bank", "Card"]
+CATEGORIES = ["food", "rent", "fuel", "groceries"]
+TAGS = ["college", "family", "work", "football"]
+
+
+def seed(conn, contacts, loans, rng):
+    names = [f"Contact{i}" for i in range(contacts)]
+    for name in names:
+        models.add_contact(conn, name, "friend", rng.sample(TAGS, 2), "")
+    start = date(2025, 1, 1)
+    for _ in range(loans):
+        d = (start + timedelta(days=rng.randrange(365))).isoformat()
+        role = rng.choice(["you_lent", "you_borrowed"])
+        models.create_loan(conn, rng.choice(names), rng.choice(ACCOUNTS), rng.randrange(100, 10000), role, d)
+    for _ in range(loans):
+        d = (start + timedelta(days=rng.randrange(365))).isoformat()
+        models.add_transaction(
+            conn, rng.choice(ACCOUNTS), -rng.randrange(10, 5000), d, category=rng.choice(CATEGORIES)
+        )
+    return names
+
+
+def corpus(n, names, rng):
+    return [
+        rng.choice(TEMPLATES).format(
+            window=rng.choice(WINDOWS),
+            contact=rng.choice(names),
+            account=rng.choice(ACCOUNTS),
+            category=rng.choice(CATEGORIES),
+            tag=rng.choice(TAGS),
+        )
+        for _ in range(n)
+    ]
+
+
+def run(conn, questions):
+    timings = []
+    for q in questions:
+        t0 = time.perf_counter()
+        models.ask_agent(conn, q)
+        timings.append((time.perf_counter() - t0) * 1e6)
+    return timings
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(
+        f"{label:<6} n={len(timings)} mean={statistics.mean(timings):8.1f}us "
+        f"p50={statistics.median(timings):8.1f}us p95={p95:8.1f}us"
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--questions", type=int, default=3000)
+    ap.add_argument("--contacts", type=int, default=200)
+    ap.add_argument("--loans", type=int, default=5000)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["ONEPAISA_DB_PATH"] = os.path.join(tmp, "bench.sqlite")
+        conn = get_conn()
+        names = seed(conn, args.contacts, args.loans, rng)
+        questions = corpus(args.questions, names, rng)
+        intents._parse.cache_clear()
+        intents.plan.cache_clear()
+        report("cold", run(conn, questions))
+        report("warm", run(conn, questions))
+        print(f"parse cache: {intents._parse.cache_info()}")
+        print(f"plan cache:  {intents.plan.cache_info()}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import click
+import csv
 import json
+import sys
 from onepaisa.db import get_conn, get_db_path
 from onepaisa import models
 from rich.console import Console
@@ -76,9 +78,10 @@ def contact_add(name, relation, tags, note):
 
 
 @cli.command("contact-list")
-def contact_list():
+@click.option("--tag", help="Only list contacts with this tag.")
+def contact_list(tag):
     conn = get_conn()
-    rows = models.list_contacts(conn)
+    rows = models.list_contacts(conn, tag)
     table = Table(title="👥 Your Contacts", header_style="bold bright_white on bright_blue", border_style="bright_blue")
     table.add_column("ID", style="dim cyan", justify="center")
     table.add_column("Name", style="bold bright_yellow", justify="left")
@@ -86,7 +89,7 @@ def contact_list():
     table.add_column("Tags", style="magenta", justify="left")
     table.add_column("Note", style="dim white", justify="left")
     for r in rows:
-        tags = ",".join(json.loads(r["tags"] or "[]")) if r["tags"] else "None"
+        tags = r["tag_list"] or "None"
         table.add_row(
             str(r["id"]),
             r["name"],
@@ -104,10 +107,11 @@ def contact_list():
 @click.option("--account", required=True)
 @click.option("--amount", required=True, type=float)
 @click.option("--date")
-@click.option("--due")
+@click.option("--due", type=click.DateTime(formats=["%Y-%m-%d"]))
 @click.option("--note")
 def lend(contact, account, amount, date, due, note):
     conn = get_conn()
+    due = due.date().isoformat() if due else None
     models.create_loan(conn, contact, account, amount, "you_lent", date, due, note)
     panel = Panel(f"💸 Loan recorded: You lent [bold bright_red]{amount:.2f}[/bold bright_red] to [bold bright_yellow]{contact}[/bold bright_yellow] via {account}.\nDue: {due or 'N/A'}\nNote: {note or 'None'}", title="📤 Money Lent", border_style="red")
     console.print(panel)
@@ -119,10 +123,11 @@ def lend(contact, account, amount, date, due, note):
 @click.option("--account", required=True)
 @click.option("--amount", required=True, type=float)
 @click.option("--date")
-@click.option("--due")
+@click.option("--due", type=click.DateTime(formats=["%Y-%m-%d"]))
 @click.option("--note")
 def borrow(contact, account, amount, date, due, note):
     conn = get_conn()
+    due = due.date().isoformat() if due else None
     models.create_loan(conn, contact, account, amount, "you_borrowed", date, due, note)
     panel = Panel(f"💰 Loan recorded: You borrowed [bold bright_green]{amount:.2f}[/bold bright_green] from [bold bright_yellow]{contact}[/bold bright_yellow] via {account}.\nDue: {due or 'N/A'}\nNote: {note or 'None'}", title="📥 Money Borrowed", border_style="green")
     console.print(panel)
@@ -173,10 +178,12 @@ def contact_summary(contact):
 
 
 @cli.command("contacts-report")
-def contacts_report_cmd():
+@click.option("--tag", help="Only report on contacts with this tag.")
+def contacts_report_cmd(tag):
     conn = get_conn()
-    rep = models.contacts_report(conn)
-    table = Table(title="📋 Global Contacts Report", header_style="bold bright_white on bright_green", border_style="bright_green")
+    rep = models.contacts_report(conn, tag)
+    title = f"📋 Contacts Report: #{tag}" if tag else "📋 Global Contacts Report"
+    table = Table(title=title, header_style="bold bright_white on bright_green", border_style="bright_green")
     table.add_column("Name", style="bold bright_yellow", justify="left")
     table.add_column("They owe you", style="green", justify="right")
     table.add_column("You owe them", style="red", justify="right")
@@ -213,6 +220,58 @@ def aging_cmd():
     print_footer()
 
 
+@cli.command("due")
+@click.option("--days", default=7, type=click.IntRange(min=0), help="Include loans falling due within this many days.")
+@click.option("--output", default="table", type=click.Choice(["table", "json"]))
+@click.option("--check-invalid", is_flag=True, help="Also scan all open loans for unusable due dates.")
+def due_cmd(days, output, check_invalid):
+    conn = get_conn()
+    rep = models.due_loans(conn, days, check_invalid=check_invalid)
+    if output == "json":
+        click.echo(json.dumps(rep, separators=(",", ":")))
+        return
+    table = Table(title=f"📆 Due Loans (next {days} days)", header_style="bold bright_white on bright_red", border_style="bright_red")
+    table.add_column("Contact", style="bold bright_yellow", justify="left")
+    table.add_column("Loan", style="dim cyan", justify="center")
+    table.add_column("Due", style="magenta", justify="center")
+    table.add_column("Status", justify="center")
+    table.add_column("They owe you", style="green", justify="right")
+    table.add_column("You owe them", style="red", justify="right")
+
+    def amounts(role, amount):
+        if role == "you_lent":
+            return f"💰 {amount:.2f}", ""
+        return "", f"💸 {amount:.2f}"
+
+    for c in rep["contacts"]:
+        for loan in c["loans"]:
+            if loan["overdue"]:
+                status = f"[bold red]overdue {-loan['days_left']}d[/bold red]"
+            else:
+                status = f"[yellow]in {loan['days_left']}d[/yellow]"
+            table.add_row(c["name"], str(loan["id"]), loan["due_date"], status, *amounts(loan["role"], loan["open_amount"]))
+    for loan in rep["invalid"]:
+        table.add_row(
+            loan["contact"],
+            str(loan["id"]),
+            loan["due_date"],
+            "[bold red]invalid due date[/bold red]",
+            *amounts(loan["role"], loan["open_amount"]),
+        )
+    for label, key in (("OVERDUE", "overdue"), ("UPCOMING", "upcoming")):
+        table.add_row(
+            f"[bold]{label}[/bold]",
+            "",
+            "",
+            "",
+            f"[bold green]💰 {rep[key + '_they_owe_you']:.2f}[/bold green]",
+            f"[bold red]💸 {rep[key + '_you_owe_them']:.2f}[/bold red]",
+        )
+    panel = Panel(table, title="⏳ Overdue & Upcoming", border_style="bright_magenta")
+    console.print(panel)
+    print_footer()
+
+
 @cli.command("summary")
 @click.option("--period", default="month", type=click.Choice(["day", "week", "month"]))
 @click.option("--month")
@@ -223,12 +282,41 @@ def summary_cmd(period, month):
     print_footer()
 
 
+@cli.command("export")
+@click.option("--tag", help="Only export transactions with this tag.")
+@click.option("--format", "fmt", default="csv", type=click.Choice(["csv", "json"]))
+@click.option("--file", "path", type=click.Path(dir_okay=False, writable=True), help="Write to a file instead of stdout.")
+def export_cmd(tag, fmt, path):
+    conn = get_conn()
+    rows = [dict(r) for r in models.list_transactions(conn, tag)]
+    for r in rows:
+        r["tags"] = r.pop("tag_list") or ""
+    fields = ["id", "date", "account", "amount", "category", "merchant", "note", "tags"]
+    out = open(path, "w", newline="", encoding="utf-8") if path else sys.stdout
+    try:
+        if fmt == "json":
+            json.dump(rows, out, indent=2)
+            out.write("\n")
+        else:
+            writer = csv.DictWriter(out, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+    finally:
+        if path:
+            out.close()
+    if path:
+        panel = Panel(f"📦 Exported [bold bright_green]{len(rows)}[/bold bright_green] transactions to [bold]{path}[/bold]", title="💾 Export Complete", border_style="green")
+        console.print(panel)
+        print_footer()
+
+
 @cli.command("ask")
+@click.option("--tag", help="Restrict the question to contacts with this tag.")
 @click.argument("query", nargs=-1)
-def ask_cmd(query):
+def ask_cmd(tag, query):
     q = " ".join(query)
     conn = get_conn()
-    ans = models.ask_agent(conn, q)
+    ans = models.ask_agent(conn, q, tag)
     panel = Panel(f"""🤖 Answer: [bold bright_cyan]{ans['answer']}[/bold bright_cyan]
 
 📝 Explanation: {ans['explanation']}""", title="🧠 AI Assistant Response", border_style="bright_blue")
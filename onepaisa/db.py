@@ -3,8 +3,10 @@ Database helper for onepaisa.
 DB path defaults to ~/.onepaisa/onepaisa_db.sqlite but can be overridden with env var ONEPAISA_DB_PATH.
 """
 
+from datetime import datetime
 from pathlib import Path
 import sqlite3
+import json
 import os
 
 SCHEMA = """
@@ -30,6 +32,87 @@ CREATE TABLE IF NOT EXISTS loan_payments (
 );
 """
 
+# Tags are case-insensitive: "College" and "college" are the same tag.
+TAG_TABLES = """
+CREATE TABLE IF NOT EXISTS contact_tags (
+  contact_id INTEGER NOT NULL, tag TEXT NOT NULL COLLATE NOCASE, PRIMARY KEY(contact_id, tag),
+  FOREIGN KEY(contact_id) REFERENCES contacts(id)
+);
+CREATE INDEX IF NOT EXISTS idx_contact_tags_tag ON contact_tags(tag, contact_id);
+CREATE TABLE IF NOT EXISTS transaction_tags (
+  txn_id INTEGER NOT NULL, tag TEXT NOT NULL COLLATE NOCASE, PRIMARY KEY(txn_id, tag),
+  FOREIGN KEY(txn_id) REFERENCES transactions(id)
+);
+CREATE INDEX IF NOT EXISTS idx_transaction_tags_tag ON transaction_tags(tag, txn_id);
+"""
+
+
+def _backfill_tags(conn):
+    """Create the tag tables and copy tags out of the legacy JSON columns."""
+    conn.executescript(TAG_TABLES)
+    for table, link, col in (
+        ("contacts", "contact_tags", "contact_id"),
+        ("transactions", "transaction_tags", "txn_id"),
+    ):
+        rows = conn.execute(f"SELECT id, tags FROM {table} WHERE tags IS NOT NULL").fetchall()
+        for row_id, raw in rows:
+            try:
+                tags = json.loads(raw) if raw else []
+            except ValueError:
+                tags = []
+            if not isinstance(tags, list):
+                tags = []
+            conn.executemany(
+                f"INSERT OR IGNORE INTO {link}({col},tag) VALUES(?,?)",
+                [(row_id, str(t).strip()) for t in tags if str(t).strip()],
+            )
+
+
+def _fold_tag_case(conn):
+    """Rebuild tag tables created with case-sensitive tags, collapsing duplicates."""
+    for link, col in (("contact_tags", "contact_id"), ("transaction_tags", "txn_id")):
+        ddl = conn.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (link,)).fetchone()[0]
+        if "COLLATE NOCASE" in ddl:
+            continue
+        conn.execute(f"ALTER TABLE {link} RENAME TO {link}_old")
+        conn.execute(f"DROP INDEX IF EXISTS idx_{link}_tag")
+        conn.executescript(TAG_TABLES)
+        conn.execute(f"INSERT OR IGNORE INTO {link}({col},tag) SELECT {col}, tag FROM {link}_old ORDER BY rowid")
+        conn.execute(f"DROP TABLE {link}_old")
+
+
+def _normalize_due_dates(conn):
+    """Zero-pad due dates written before --due was validated (2025-3-1 -> 2025-03-01)."""
+    rows = conn.execute(
+        "SELECT id, due_date FROM loans WHERE due_date IS NOT NULL "
+        "AND due_date NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'"
+    ).fetchall()
+    for loan_id, raw in rows:
+        try:
+            due = datetime.strptime(raw.strip(), "%Y-%m-%d").date()
+        except ValueError:
+            continue  # left as-is; reported by `due --check-invalid`
+        conn.execute("UPDATE loans SET due_date=? WHERE id=?", (due.isoformat(), loan_id))
+
+
+# Schema changes (SQL scripts or callables) applied in order; PRAGMA user_version records how many have run.
+MIGRATIONS = [
+    # 1: open loans by due date, for overdue/upcoming range scans
+    "CREATE INDEX IF NOT EXISTS idx_loans_open_due ON loans(due_date) "
+    "WHERE status='open' AND due_date IS NOT NULL;",
+    # 2: normalized contact/transaction tags, backfilled from the JSON columns
+    _backfill_tags,
+    # 3: range filters used by the ask planner
+    "CREATE INDEX IF NOT EXISTS idx_loans_role_date ON loans(role, date);"
+    "CREATE INDEX IF NOT EXISTS idx_loans_contact ON loans(contact_id, status);"
+    "CREATE INDEX IF NOT EXISTS idx_contacts_name ON contacts(name COLLATE NOCASE);"
+    "CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date);",
+    # 4: tag tables from before tags were case-insensitive
+    _fold_tag_case,
+    # 5: due dates written before --due was validated
+    _normalize_due_dates,
+]
+
 
 def get_db_path():
     env = os.environ.get("ONEPAISA_DB_PATH")
@@ -48,4 +131,16 @@ def get_conn():
     if first:
         conn.executescript(SCHEMA)
         conn.commit()
+    migrate(conn)
     return conn
+
+
+def migrate(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for n, step in enumerate(MIGRATIONS[version:], start=version + 1):
+        if callable(step):
+            step(conn)
+        else:
+            conn.executescript(step)
+        conn.execute(f"PRAGMA user_version = {n}")
+    conn.commit()
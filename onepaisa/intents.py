@@ -0,0 +1,447 @@
+"""
+Intent parser and SQL planner for the ask assistant.
+
+parse() turns a question into an intent dict (metric, time window, contact, role,
+account, category, tag). plan() compiles the *shape* of an intent -- which of those
+fields are present -- into a parameterized SQL statement. Both are cached, so a
+repeated question skips parsing and re-runs identical SQL text, which sqlite3 serves
+from its per-connection prepared statement cache.
+
+New intents can be added with register_intent().
+"""
+
+from datetime import date, timedelta
+from functools import lru_cache
+import re
+
+_ISO = r"\d{4}-\d{2}-\d{2}"
+_NAME = r"(\"[^\"]+\"|[a-z][\w.-]*)"
+# Up to four words that may be (or start/end with) a contact name; resolved against
+# the contacts table at answer time.
+_WORDS = r"(\"[^\"]+\"|[a-z][\w.'-]*(?: [a-z][\w.'-]*){0,3})"
+
+# Words that follow "to"/"from"/"with" without naming a contact.
+_NOT_NAMES = {
+    "i", "me", "my", "you", "your", "them", "they", "us", "we", "the", "a", "an",
+    "others", "other", "contacts", "people", "everyone", "anyone", "someone", "friends", "family",
+    "account", "wallet", "who", "what", "much", "it", "that",
+}
+
+# Time windows, first match wins. Each maps a match to a symbolic spec so parse()
+# stays independent of today's date and can be cached.
+_WINDOWS = [
+    (re.compile(rf"\bbetween ({_ISO}) and ({_ISO})\b"), lambda m: ("between", m.group(1), m.group(2))),
+    (re.compile(rf"\bfrom ({_ISO}) (?:to|until|till) ({_ISO})\b"), lambda m: ("between", m.group(1), m.group(2))),
+    (re.compile(rf"\b(?:since|after) ({_ISO})\b"), lambda m: ("since", m.group(1))),
+    (re.compile(rf"\bbefore ({_ISO})\b"), lambda m: ("before", m.group(1))),
+    (re.compile(rf"\bon ({_ISO})\b"), lambda m: ("between", m.group(1), m.group(1))),
+    (re.compile(r"\b(?:in the )?(?:last|past) (\d+) days?\b"), lambda m: ("last_days", int(m.group(1)))),
+    (re.compile(r"\btoday\b"), lambda m: ("today",)),
+    (re.compile(r"\byesterday\b"), lambda m: ("yesterday",)),
+    (re.compile(r"\bthis week\b"), lambda m: ("this_week",)),
+    (re.compile(r"\blast week\b"), lambda m: ("last_week",)),
+    (re.compile(r"\bthis month\b"), lambda m: ("this_month",)),
+    (re.compile(r"\blast month\b"), lambda m: ("last_month",)),
+    (re.compile(r"\bthis year\b"), lambda m: ("this_year",)),
+    (re.compile(r"\blast year\b"), lambda m: ("last_year",)),
+    (re.compile(r"\b(?:ever|all time|in total|overall)\b"), lambda m: ("all",)),
+]
+
+_TAG = [re.compile(r"\btagged #?([\w-]+)"), re.compile(r"\btag #?([\w-]+)"), re.compile(r"#([\w-]+)")]
+_ACCOUNT = [
+    re.compile(rf"\b(?:via|using) (?:my )?{_NAME}"),
+    re.compile(rf"\baccount {_NAME}"),
+    re.compile(rf"\b(?:in|from) (?:my )?([\w-]+) account\b"),
+]
+_CATEGORY = [re.compile(rf"\bcategory {_NAME}"), re.compile(rf"\bon {_NAME}")]
+# (pattern, anchor): "left" when the name starts right after the keyword, so extra
+# trailing words may follow it; "right" when it ends right before the keyword.
+_CONTACT = [
+    (re.compile(rf"\bdoes {_WORDS} owe\b"), "left"),
+    (re.compile(rf"\b(?:to|from|with) {_WORDS}"), "left"),
+    (re.compile(rf"\b{_WORDS} owes\b"), "right"),
+    (re.compile(rf"\bowe {_WORDS}"), "left"),
+]
+_ROLE_LENT = re.compile(r"\bowes? me\b|\bowed to me\b|\bthey owe\b|\byou_lent\b|\bto collect\b")
+_ROLE_BORROWED = re.compile(r"\bi owe\b|\bdo i owe\b|\bi still owe\b|\byou_borrowed\b")
+
+FILTERS = ("contact", "account", "category", "tag")
+
+# Registered intents, tried in order:
+# {"metric", "pattern", "planner", "reducer", "default_window", "filters"}.
+INTENTS = []
+
+
+def register_intent(
+    metric: str, pattern: str, planner, reducer=None, default_window=("all",), filters=FILTERS, first=False
+):
+    """Add an intent: questions matching `pattern` are answered by `planner(shape)`'s SQL.
+
+    `filters` names the entity filters the planner applies; others are left out of
+    the plan and reported as ignored in the explanation.
+    """
+    entry = {
+        "metric": metric,
+        "pattern": re.compile(pattern),
+        "planner": planner,
+        "reducer": reducer or _scalar,
+        "default_window": default_window,
+        "filters": tuple(filters),
+    }
+    if first:
+        INTENTS.insert(0, entry)
+    else:
+        INTENTS.append(entry)
+    _parse.cache_clear()
+    plan.cache_clear()
+
+
+def _intent(metric: str):
+    return next(i for i in INTENTS if i["metric"] == metric)
+
+
+def _valid_window(window):
+    """Explicit dates must be real calendar dates."""
+    if window[0] not in ("between", "since", "before"):
+        return True
+    try:
+        for d in window[1:]:
+            date.fromisoformat(d)
+    except ValueError:
+        return False
+    return True
+
+
+def _take(patterns, text, skip=()):
+    """Return (value, text with the match removed) for the first usable match."""
+    for pat in patterns:
+        for m in pat.finditer(text):
+            value = m.group(1).strip('"')
+            if value in skip:
+                continue
+            return value, text[: m.start()] + " " + text[m.end():]
+    return None, text
+
+
+def _take_contact(text):
+    """Return (candidate words, anchor) for the first usable contact phrase."""
+    for pat, anchor in _CONTACT:
+        for m in pat.finditer(text):
+            value = m.group(1)
+            if value.startswith('"'):
+                return value.strip('"'), "exact"
+            words = value.split(" ")
+            if (words[0] if anchor == "left" else words[-1]) in _NOT_NAMES:
+                continue
+            if anchor == "left":
+                # stop at the first filler word: "to ali and me" -> "ali and"
+                words = words[: next((i for i, w in enumerate(words) if i and w in _NOT_NAMES), len(words))]
+            return " ".join(words), anchor
+    return None, None
+
+
+@lru_cache(maxsize=2048)
+def _parse(text: str):
+    for intent in INTENTS:
+        if intent["pattern"].search(text):
+            metric = intent["metric"]
+            break
+    else:
+        return None
+    window = intent["default_window"]
+    for pat, build in _WINDOWS:
+        m = pat.search(text)
+        if m:
+            window = build(m)
+            text = text[: m.start()] + " " + text[m.end():]
+            break
+    if not _valid_window(window):
+        return None
+    role = None
+    if _ROLE_LENT.search(text):
+        role = "you_lent"
+    elif _ROLE_BORROWED.search(text):
+        role = "you_borrowed"
+    tag, text = _take(_TAG, text)
+    account, text = _take(_ACCOUNT, text, _NOT_NAMES - {"wallet"})
+    category, text = _take(_CATEGORY, text, _NOT_NAMES)
+    contact, contact_anchor = _take_contact(text)
+    return (
+        ("metric", metric),
+        ("window", window),
+        ("role", role),
+        ("contact", contact),
+        ("contact_anchor", contact_anchor),
+        ("account", account),
+        ("category", category),
+        ("tag", tag),
+    )
+
+
+def parse(query: str):
+    """Parse a question into an intent dict, or None if no intent matches."""
+    parsed = _parse(" ".join(query.lower().replace("?", " ").split()))
+    return dict(parsed) if parsed else None
+
+
+def resolve_window(window, today: date):
+    """Turn a window spec into (start, end) ISO dates; end is exclusive, either may be None."""
+    kind = window[0]
+    day = timedelta(days=1)
+    month_start = today.replace(day=1)
+    week_start = today - timedelta(days=today.weekday())
+    if kind == "between":
+        lo, hi = sorted(date.fromisoformat(d) for d in window[1:])
+        return lo.isoformat(), (hi + day).isoformat()
+    if kind == "since":
+        return window[1], None
+    if kind == "before":
+        return None, window[1]
+    if kind == "last_days":
+        return (today - timedelta(days=window[1])).isoformat(), None
+    if kind == "today":
+        return today.isoformat(), (today + day).isoformat()
+    if kind == "yesterday":
+        return (today - day).isoformat(), today.isoformat()
+    if kind == "this_week":
+        return week_start.isoformat(), None
+    if kind == "last_week":
+        return (week_start - timedelta(days=7)).isoformat(), week_start.isoformat()
+    if kind == "this_month":
+        return month_start.isoformat(), None
+    if kind == "last_month":
+        return (month_start - day).replace(day=1).isoformat(), month_start.isoformat()
+    if kind == "this_year":
+        return today.replace(month=1, day=1).isoformat(), None
+    if kind == "last_year":
+        return today.replace(year=today.year - 1, month=1, day=1).isoformat(), today.replace(month=1, day=1).isoformat()
+    return None, None
+
+
+def shape_of(intent, start, end):
+    """The cache key for plan(): which supported filters are present, not their values."""
+    supported = _intent(intent["metric"])["filters"]
+    return (intent["metric"], intent["role"], start is not None, end is not None) + tuple(
+        f in supported and intent[f] is not None for f in FILTERS
+    )
+
+
+# Planners return (sql, params, explanation) where params are the value keys in
+# placeholder order and explanation is a str.format template over the same keys.
+
+
+def _loan_filters(shape, date_col="l.date"):
+    _, _, has_start, has_end, has_contact, has_account, _, has_tag = shape
+    joins, params, where, wparams, conds = [], [], [], [], []
+    if has_tag:
+        joins.append("JOIN contact_tags t ON t.contact_id=l.contact_id AND t.tag=? COLLATE NOCASE")
+        params.append("tag")
+    if has_account:
+        joins.append("JOIN transactions tx ON tx.id=l.txn_id JOIN accounts a ON a.id=tx.account_id")
+    if has_start:
+        where.append(f"{date_col}>=?")
+        wparams.append("start")
+        conds.append("date >= '{start}'")
+    if has_end:
+        where.append(f"{date_col}<?")
+        wparams.append("end")
+        conds.append("date < '{end}'")
+    if has_contact:
+        where.append("c.name=? COLLATE NOCASE")
+        wparams.append("contact")
+        conds.append("contact = '{contact}'")
+    if has_account:
+        where.append("a.name=? COLLATE NOCASE")
+        wparams.append("account")
+        conds.append("account = '{account}'")
+    if has_tag:
+        conds.append("contact tag = '{tag}'")
+    return joins, params, where, wparams, conds
+
+
+def _plan_loan_sum(role):
+    def planner(shape):
+        joins, params, where, wparams, conds = _loan_filters(shape)
+        if shape[4]:
+            joins.insert(0, "JOIN contacts c ON c.id=l.contact_id")
+        sql = " ".join(
+            ["SELECT IFNULL(SUM(l.amount),0.0) FROM loans l"] + joins + ["WHERE " + " AND ".join([f"l.role='{role}'"] + where)]
+        )
+        explanation = "SUM(" + " AND ".join([f"loans.role='{role}'"] + conds) + ") = {answer}"
+        return sql, tuple(params + wparams), explanation
+
+    return planner
+
+
+def _plan_outstanding(shape):
+    _, role, has_start, has_end, has_contact, has_account, _, has_tag = shape
+    open_amt = "l.amount - IFNULL(l.repaid_amount,0)"
+    # Driven from contacts with a LEFT JOIN so the answer matches contacts_report():
+    # every (matching) contact is listed, with 0.0 when nothing is open.
+    sql = [
+        f"SELECT c.name, IFNULL(SUM(CASE WHEN l.role='you_lent' THEN {open_amt} END),0.0),",
+        f"IFNULL(SUM(CASE WHEN l.role='you_borrowed' THEN {open_amt} END),0.0)",
+        "FROM contacts c",
+    ]
+    params, conds = [], []
+    if has_tag:
+        sql.append("JOIN contact_tags t ON t.contact_id=c.id AND t.tag=? COLLATE NOCASE")
+        params.append("tag")
+    on = ["l.contact_id=c.id", "l.status='open'"]
+    if role:
+        on.append(f"l.role='{role}'")
+        conds.append(f"loans.role='{role}'")
+    for present, clause, key, cond in (
+        (has_start, "l.date>=?", "start", "date >= '{start}'"),
+        (has_end, "l.date<?", "end", "date < '{end}'"),
+        (
+            has_account,
+            "l.txn_id IN (SELECT tx.id FROM transactions tx JOIN accounts a ON a.id=tx.account_id "
+            "WHERE a.name=? COLLATE NOCASE)",
+            "account",
+            "account = '{account}'",
+        ),
+    ):
+        if present:
+            on.append(clause)
+            params.append(key)
+            conds.append(cond)
+    sql.append("LEFT JOIN loans l ON " + " AND ".join(on))
+    if has_contact:
+        sql.append("WHERE c.name=? COLLATE NOCASE")
+        params.append("contact")
+        conds.append("contact = '{contact}'")
+    if has_tag:
+        conds.append("contact tag = '{tag}'")
+    sql.append("GROUP BY c.id ORDER BY c.name")
+    explanation = "OPEN(" + " AND ".join(["loans.status='open'"] + conds) + ") by contact, net = {net}"
+    return " ".join(sql), tuple(params), explanation
+
+
+def _plan_spent(shape):
+    _, _, has_start, has_end, has_contact, has_account, has_category, has_tag = shape
+    joins, params = [], []
+    where = ["tx.amount<0", "tx.category NOT IN ('lend','loan_payment')"]
+    wparams, conds = [], ["transactions.amount < 0"]
+    if has_tag:
+        joins.append("JOIN transaction_tags t ON t.txn_id=tx.id AND t.tag=? COLLATE NOCASE")
+        params.append("tag")
+    if has_account:
+        joins.append("JOIN accounts a ON a.id=tx.account_id")
+    for present, clause, key, cond in (
+        (has_start, "tx.date>=?", "start", "date >= '{start}'"),
+        (has_end, "tx.date<?", "end", "date < '{end}'"),
+        (has_contact, "tx.merchant=? COLLATE NOCASE", "contact", "merchant = '{contact}'"),
+        (has_account, "a.name=? COLLATE NOCASE", "account", "account = '{account}'"),
+        (has_category, "tx.category=? COLLATE NOCASE", "category", "category = '{category}'"),
+    ):
+        if present:
+            where.append(clause)
+            wparams.append(key)
+            conds.append(cond)
+    if has_tag:
+        conds.append("tag = '{tag}'")
+    sql = " ".join(["SELECT IFNULL(-SUM(tx.amount),0.0) FROM transactions tx"] + joins + ["WHERE " + " AND ".join(where)])
+    explanation = "SUM(" + " AND ".join(conds) + ") = {answer}"
+    return sql, tuple(params + wparams), explanation
+
+
+def _scalar(rows):
+    return float(rows[0][0])
+
+
+def _report(rows):
+    contacts = []
+    they_owe = 0.0
+    you_owe = 0.0
+    for name, lent_open, bor_open in rows:
+        they_owe += lent_open
+        you_owe += bor_open
+        contacts.append(
+            {"name": name, "they_owe_you": lent_open, "you_owe_them": bor_open, "net": lent_open - bor_open}
+        )
+    return {"contacts": contacts, "grand_they_owe": they_owe, "grand_you_owe": you_owe, "net": they_owe - you_owe}
+
+
+@lru_cache(maxsize=256)
+def plan(shape):
+    """Compile an intent shape to (sql, params, explanation, reducer)."""
+    intent = _intent(shape[0])
+    sql, params, explanation = intent["planner"](shape)
+    return sql, params, explanation, intent["reducer"]
+
+
+def _resolve_contact(conn, phrase: str, anchor: str):
+    """Match a contact phrase to the longest known contact name.
+
+    Returns (name to filter on, note for the explanation or None).
+    """
+    words = phrase.split(" ")
+    if anchor == "exact":
+        spans = [phrase]
+    elif anchor == "left":
+        spans = [" ".join(words[:n]) for n in range(len(words), 0, -1)]
+    else:
+        spans = [" ".join(words[-n:]) for n in range(len(words), 0, -1)]
+    row = conn.execute(
+        f"SELECT name FROM contacts WHERE name COLLATE NOCASE IN ({','.join('?' * len(spans))}) "
+        "ORDER BY length(name) DESC LIMIT 1",
+        spans,
+    ).fetchone()
+    if row is None:
+        return spans[-1] if anchor == "right" else spans[0], f"no contact named '{phrase}'"
+    name = row[0]
+    if anchor == "left":
+        leftover = words[len(name.split()):]
+        if leftover:
+            return name, f"not understood: '{' '.join(leftover)}'"
+    return name, None
+
+
+def answer(conn, intent, today: date = None):
+    """Run an intent's plan and return {"answer", "explanation"}."""
+    notes = []
+    if intent["contact"] is not None and "contact" in _intent(intent["metric"])["filters"]:
+        intent = dict(intent)
+        intent["contact"], note = _resolve_contact(conn, intent["contact"], intent["contact_anchor"])
+        if note:
+            notes.append(note)
+    start, end = resolve_window(intent["window"], today or date.today())
+    sql, params, explanation, reducer = plan(shape_of(intent, start, end))
+    values = dict(intent, start=start, end=end)
+    result = reducer(conn.execute(sql, [values[k] for k in params]).fetchall())
+    net = result["net"] if isinstance(result, dict) else result
+    explanation = explanation.format(answer=result, net=net, **values)
+    supported = _intent(intent["metric"])["filters"]
+    ignored = [f"{f} = '{intent[f]}'" for f in FILTERS if f not in supported and intent[f] is not None]
+    if ignored:
+        explanation += f" (ignored, not applicable to {intent['metric']}: {', '.join(ignored)})"
+    for note in notes:
+        explanation += f" ({note})"
+    return {"answer": result, "explanation": explanation}
+
+
+# Order mirrors the original rule chain: lent and borrowed questions win over
+# "outstanding", so "how much i borrow from others" is still a borrowed sum.
+register_intent(
+    "lent",
+    r"\b(?:gave|give|given|lent|lend|lending)\b",
+    _plan_loan_sum("you_lent"),
+    default_window=("this_month",),
+    filters=("contact", "account", "tag"),
+)
+register_intent(
+    "borrowed",
+    r"\b(?:took|take|taken|borrowed|borrowing)\b|\bborrow\b(?! from others)|\bhow much i borrow\b",
+    _plan_loan_sum("you_borrowed"),
+    default_window=("this_month",),
+    filters=("contact", "account", "tag"),
+)
+register_intent(
+    "outstanding",
+    r"\boutstanding\b|\bowes?\b|\bowed\b|\bbalances?\b|\bborrow from others\b",
+    _plan_outstanding,
+    _report,
+    filters=("contact", "account", "tag"),
+)
+register_intent("spent", r"\b(?:spent|spend|spending|expenses?)\b", _plan_spent, default_window=("this_month",))
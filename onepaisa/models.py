@@ -2,15 +2,29 @@
 High-level models and business logic for onepaisa CLI.
 """
 
-from datetime import date
+from datetime import date, timedelta
 import json
 
+from onepaisa import intents
+
 
 
 def today_iso():
     return date.today().isoformat()
 
 
+def _normalize_tags(tags):
+    # tags are case-insensitive; keep the first spelling of each
+    seen = []
+    folded = set()
+    for t in tags or []:
+        t = str(t).strip()
+        if t and t.casefold() not in folded:
+            folded.add(t.casefold())
+            seen.append(t)
+    return seen
+
+
 # Accounts
 
 
@@ -32,18 +46,32 @@ def ensure_account(conn, name: str):
 
 
 def add_contact(conn, name: str, relation: str = "other", tags=None, note: str = ""):
+    tags = _normalize_tags(tags)
     cur = conn.cursor()
     cur.execute(
         "INSERT INTO contacts(name,relation,tags,note,created_at) VALUES(?,?,?,?,?)",
-        (name, relation, json.dumps(tags or []), note or "", today_iso()),
+        (name, relation, json.dumps(tags), note or "", today_iso()),
+    )
+    contact_id = cur.lastrowid
+    cur.executemany(
+        "INSERT OR IGNORE INTO contact_tags(contact_id,tag) VALUES(?,?)",
+        [(contact_id, t) for t in tags],
     )
     conn.commit()
-    return cur.lastrowid
+    return contact_id
 
 
-def list_contacts(conn):
+def list_contacts(conn, tag: str = None):
     cur = conn.cursor()
-    return cur.execute("SELECT * FROM contacts ORDER BY name").fetchall()
+    sql = (
+        "SELECT c.*, (SELECT group_concat(t.tag, ',') FROM contact_tags t WHERE t.contact_id=c.id) AS tag_list "
+        "FROM contacts c"
+    )
+    params = ()
+    if tag:
+        sql += " JOIN contact_tags ct ON ct.contact_id=c.id AND ct.tag=? COLLATE NOCASE"
+        params = (tag,)
+    return cur.execute(sql + " ORDER BY c.name", params).fetchall()
 
 
 # Transactions
@@ -60,6 +88,7 @@ def add_transaction(
     tags=None,
 ):
     acc_id = ensure_account(conn, account)
+    tags = _normalize_tags(tags)
     cur = conn.cursor()
     cur.execute(
         "INSERT INTO transactions(account_id,date,amount,category,merchant,note,tags) VALUES(?,?,?,?,?,?,?)",
@@ -70,11 +99,30 @@ def add_transaction(
             category or "",
             merchant or "",
             note or "",
-            json.dumps(tags or []),
+            json.dumps(tags),
         ),
     )
+    txn_id = cur.lastrowid
+    cur.executemany(
+        "INSERT OR IGNORE INTO transaction_tags(txn_id,tag) VALUES(?,?)",
+        [(txn_id, t) for t in tags],
+    )
     conn.commit()
-    return cur.lastrowid
+    return txn_id
+
+
+def list_transactions(conn, tag: str = None):
+    cur = conn.cursor()
+    sql = (
+        "SELECT tx.id, tx.date, a.name AS account, tx.amount, tx.category, tx.merchant, tx.note, "
+        "(SELECT group_concat(t.tag, ',') FROM transaction_tags t WHERE t.txn_id=tx.id) AS tag_list "
+        "FROM transactions tx LEFT JOIN accounts a ON a.id=tx.account_id"
+    )
+    params = ()
+    if tag:
+        sql += " JOIN transaction_tags tt ON tt.txn_id=tx.id AND tt.tag=? COLLATE NOCASE"
+        params = (tag,)
+    return cur.execute(sql + " ORDER BY tx.date, tx.id", params).fetchall()
 
 
 # Loans (lend/borrow)
@@ -96,6 +144,11 @@ def create_loan(
     if not r:
         raise ValueError(f"Contact not found: {contact_name}")
     contact_id = r[0]
+    if due_date:
+        try:
+            due_date = date.fromisoformat(due_date).isoformat()
+        except ValueError:
+            raise ValueError(f"Invalid due date (expected YYYY-MM-DD): {due_date}")
     # sign: you_lent => money out (negative), you_borrowed => money in (positive)
     signed = -float(amount) if role == "you_lent" else float(amount)
     txn_id = add_transaction(
@@ -246,31 +299,33 @@ def compute_contact_summary(conn, contact_name: str):
     }
 
 
-def contacts_report(conn):
+def contacts_report(conn, tag: str = None):
     cur = conn.cursor()
-    rows = cur.execute("SELECT id,name FROM contacts ORDER BY name").fetchall()
+    open_amt = "l.amount - IFNULL(l.repaid_amount,0)"
+    sql = (
+        f"SELECT c.name, IFNULL(SUM(CASE WHEN l.role='you_lent' THEN {open_amt} END),0.0), "
+        f"IFNULL(SUM(CASE WHEN l.role='you_borrowed' THEN {open_amt} END),0.0) FROM "
+    )
+    if tag:
+        sql += "contact_tags t JOIN contacts c ON c.id=t.contact_id "
+    else:
+        sql += "contacts c "
+    sql += "LEFT JOIN loans l ON l.contact_id=c.id AND l.status='open' "
+    if tag:
+        sql += "WHERE t.tag=? COLLATE NOCASE "
+    rows = cur.execute(sql + "GROUP BY c.id ORDER BY c.name", (tag,) if tag else ()).fetchall()
     result = []
     grand_they_owe = 0.0
     grand_you_owe = 0.0
-    for r in rows:
-        cid = r[0]
-        name = r[1]
-        lent_open = cur.execute(
-            "SELECT IFNULL(SUM(amount - IFNULL(repaid_amount,0)),0) FROM loans WHERE contact_id=? AND role='you_lent' AND status='open'",
-            (cid,),
-        ).fetchone()[0]
-        bor_open = cur.execute(
-            "SELECT IFNULL(SUM(amount - IFNULL(repaid_amount,0)),0) FROM loans WHERE contact_id=? AND role='you_borrowed' AND status='open'",
-            (cid,),
-        ).fetchone()[0]
-        grand_they_owe += lent_open or 0.0
-        grand_you_owe += bor_open or 0.0
+    for name, lent_open, bor_open in rows:
+        grand_they_owe += lent_open
+        grand_you_owe += bor_open
         result.append(
             {
                 "name": name,
-                "they_owe_you": lent_open or 0.0,
-                "you_owe_them": bor_open or 0.0,
-                "net": (lent_open or 0.0) - (bor_open or 0.0),
+                "they_owe_you": lent_open,
+                "you_owe_them": bor_open,
+                "net": lent_open - bor_open,
             }
         )
     return {
@@ -305,40 +360,89 @@ def aging_buckets(conn):
     return buckets
 
 
-# Ask agent (rule-based)
+_DUE_SELECT = (
+    "SELECT l.id, l.role, l.amount, l.repaid_amount, l.date, l.due_date, l.note, c.name "
+    "FROM loans l JOIN contacts c ON c.id = l.contact_id "
+    "WHERE l.status='open' AND l.due_date IS NOT NULL AND "
+)
+# Range scan over the partial index idx_loans_open_due; relies on zero-padded ISO dates.
+DUE_LOANS_SQL = _DUE_SELECT + "l.due_date <= ? ORDER BY l.due_date"
+# Open loans whose due date cannot be ordered as text. Scans every open loan, so it
+# only runs when asked for (due --check-invalid).
+BAD_DUE_DATES_SQL = _DUE_SELECT + "l.due_date NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]' ORDER BY l.id"
 
+_DUE_BUCKETS = ("overdue_they_owe_you", "overdue_you_owe_them", "upcoming_they_owe_you", "upcoming_you_owe_them")
+
+
+def due_loans(conn, window: int = 7, as_of: str = None, check_invalid: bool = False):
+    """Open loans that are overdue or fall due within `window` days, grouped by contact.
+
+    Totals are split by direction like contacts_report(): they_owe_you for money
+    you lent, you_owe_them for money you borrowed. Loans with an unusable due date
+    are listed under "invalid"; check_invalid also scans for ones outside the range.
+    """
+    window = max(int(window), 0)
+    today = date.fromisoformat(as_of) if as_of else date.today()
+    horizon = (today + timedelta(days=window)).isoformat()
+    cur = conn.cursor()
+    rows = cur.execute(DUE_LOANS_SQL, (horizon,)).fetchall()
+    if check_invalid:
+        rows += cur.execute(BAD_DUE_DATES_SQL).fetchall()
+    contacts = {}
+    invalid = []
+    seen = set()
+    totals = dict.fromkeys(_DUE_BUCKETS, 0.0)
+    for r in rows:
+        if r["id"] in seen:
+            continue
+        seen.add(r["id"])
+        open_amt = r["amount"] - (r["repaid_amount"] or 0.0)
+        try:
+            days_left = (date.fromisoformat(r["due_date"]) - today).days
+        except ValueError:
+            days_left = None
+        if days_left is None or len(r["due_date"]) != 10:
+            invalid.append(
+                {"id": r["id"], "contact": r["name"], "role": r["role"], "open_amount": open_amt, "due_date": r["due_date"]}
+            )
+            continue
+        overdue = days_left < 0
+        bucket = ("overdue_" if overdue else "upcoming_") + (
+            "they_owe_you" if r["role"] == "you_lent" else "you_owe_them"
+        )
+        totals[bucket] += open_amt
+        entry = contacts.setdefault(r["name"], dict({"name": r["name"]}, **dict.fromkeys(_DUE_BUCKETS, 0.0), loans=[]))
+        entry[bucket] += open_amt
+        entry["loans"].append(
+            {
+                "id": r["id"],
+                "role": r["role"],
+                "open_amount": open_amt,
+                "date": r["date"],
+                "due_date": r["due_date"],
+                "days_left": days_left,
+                "overdue": overdue,
+                "note": r["note"] or "",
+            }
+        )
+    return dict(
+        {"as_of": today.isoformat(), "window": window, "contacts": list(contacts.values()), "invalid": invalid},
+        **totals,
+    )
 
-def ask_agent(conn, query: str):
-    q = query.lower()
-    if "how much i gave" in q or "how much i give" in q:
-        d = _month_start()
-        cur = conn.cursor()
-        s = cur.execute(
-            "SELECT IFNULL(SUM(amount),0) FROM loans WHERE role='you_lent' AND date>=?",
-            (d,),
-        ).fetchone()[0]
-        explanation = f"SUM(loans.role='you_lent' AND date >= '{d}') = {s}"
-        return {"answer": float(s), "explanation": explanation}
-    if "how much i take" in q or "how much i borrow" in q:
-        d = _month_start()
-        cur = conn.cursor()
-        s = cur.execute(
-            "SELECT IFNULL(SUM(amount),0) FROM loans WHERE role='you_borrowed' AND date>=?",
-            (d,),
-        ).fetchone()[0]
-        explanation = f"SUM(loans.role='you_borrowed' AND date >= '{d}') = {s}"
-        return {"answer": float(s), "explanation": explanation}
-    if "outstanding" in q or "borrow from others" in q:
-        rep = contacts_report(conn)
-        return {"answer": rep, "explanation": "contacts report"}
-    return {
-        "answer": None,
-        "explanation": "I can answer: 'how much i gave', 'how much i borrowed', 'outstanding'",
-    }
 
+# Ask agent (rule-based)
 
-def _month_start():
-    from datetime import date
 
-    d = date.today()
-    return d.replace(day=1).isoformat()
+def ask_agent(conn, query: str, tag: str = None, as_of: str = None):
+    intent = intents.parse(query)
+    if intent is None:
+        return {
+            "answer": None,
+            "explanation": "I can answer: 'how much i gave', 'how much i borrowed', 'how much i spent', "
+            "'outstanding' -- optionally with a window ('last month', 'between 2025-01-01 and 2025-03-31'), "
+            "a contact ('to Ali'), an account ('via Wallet'), a category ('on food') or a tag ('tagged college')",
+        }
+    if tag:
+        intent["tag"] = tag
+    return intents.answer(conn, intent, date.fromisoformat(as_of) if as_of else None)
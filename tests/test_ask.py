@@ -1,5 +1,8 @@
+from datetime import date
+
+from onepaisa import intents
 from onepaisa.db import get_conn
-from onepaisa.models import add_contact, create_loan, ask_agent
+from onepaisa.models import add_contact, add_transaction, contacts_report, create_loan, ask_agent
 
 
 def test_ask_gave_borrowed():
@@ -8,4 +11,105 @@ def test_ask_gave_borrowed():
     create_loan(conn, "Sara", "Wallet", 3000, "you_lent", "2025-10-01")
     r = ask_agent(conn, "how much I gave others this month")
     assert "explanation" in r
-    assert r["answer"] is not None
\ No newline at end of file
+    assert r["answer"] is not None
+
+
+def test_ask_windows_and_contacts():
+    conn = get_conn()
+    add_contact(conn, "Ali", "friend", [], "")
+    add_contact(conn, "Sara", "friend", [], "")
+    create_loan(conn, "Ali", "Wallet", 1000, "you_lent", "2025-01-10")
+    create_loan(conn, "Sara", "Wallet", 500, "you_lent", "2025-01-20")
+    create_loan(conn, "Ali", "Wallet", 200, "you_borrowed", "2025-02-05")
+    r = ask_agent(conn, "how much did I lend to Ali last month", as_of="2025-02-15")
+    assert r["answer"] == 1000
+    assert "contact = 'Ali'" in r["explanation"]
+    r = ask_agent(conn, "how much I gave between 2025-01-15 and 2025-01-31")
+    assert r["answer"] == 500
+    r = ask_agent(conn, "does ali owe me")
+    assert r["answer"]["grand_they_owe"] == 1000
+    assert r["answer"]["grand_you_owe"] == 0
+    assert ask_agent(conn, "what is the weather")["answer"] is None
+
+
+def test_ask_multi_word_contact():
+    conn = get_conn()
+    add_contact(conn, "Ali", "friend", [], "")
+    add_contact(conn, "Ali Khan", "friend", [], "")
+    create_loan(conn, "Ali", "Wallet", 100, "you_lent", "2025-01-05")
+    create_loan(conn, "Ali Khan", "Wallet", 700, "you_lent", "2025-01-10")
+    r = ask_agent(conn, "how much did I lend to Ali Khan last month", as_of="2025-02-15")
+    assert r["answer"] == 700
+    assert "contact = 'Ali Khan'" in r["explanation"]
+    r = ask_agent(conn, "does ali khan owe me")
+    assert r["answer"]["grand_they_owe"] == 700
+    r = ask_agent(conn, 'how much did I lend to "Ali" last month', as_of="2025-02-15")
+    assert r["answer"] == 100
+
+
+def test_ask_reports_unmatched_contact_text():
+    conn = get_conn()
+    add_contact(conn, "Ali", "friend", [], "")
+    create_loan(conn, "Ali", "Wallet", 1000, "you_lent", "2025-01-10")
+    r = ask_agent(conn, "how much did I lend to Ali Raza last month", as_of="2025-02-15")
+    assert r["answer"] == 1000
+    assert "not understood: 'raza'" in r["explanation"]
+    r = ask_agent(conn, "how much did I lend to Omar last month", as_of="2025-02-15")
+    assert r["answer"] == 0
+    assert "no contact named 'omar'" in r["explanation"]
+
+
+def test_ask_plan_cached_per_shape():
+    intents.plan.cache_clear()
+    a = intents.parse("how much did I lend to Ali last month")
+    b = intents.parse("how much did I lend to Sara last month")
+    sa = intents.shape_of(a, *intents.resolve_window(a["window"], date(2025, 2, 15)))
+    sb = intents.shape_of(b, *intents.resolve_window(b["window"], date(2025, 2, 15)))
+    assert sa == sb
+    assert intents.plan(sa) is intents.plan(sb)
+    assert intents.plan.cache_info().hits == 1
+
+
+def test_ask_tags_match_any_case():
+    conn = get_conn()
+    add_contact(conn, "Ali", "friend", ["College"], "")
+    create_loan(conn, "Ali", "Wallet", 1000, "you_lent", "2025-01-10")
+    add_transaction(conn, "Wallet", -40, "2025-01-15", category="food", tags=["Food"])
+    r = ask_agent(conn, "outstanding tagged College")
+    assert r["answer"]["grand_they_owe"] == 1000
+    r = ask_agent(conn, "how much I spent tagged Food between 2025-01-01 and 2025-01-31")
+    assert r["answer"] == 40.0
+
+
+def test_ask_invalid_dates_fall_back():
+    conn = get_conn()
+    assert ask_agent(conn, "how much I gave between 2025-02-30 and 2025-03-01")["answer"] is None
+    assert ask_agent(conn, "how much I gave since 2025-13-01")["answer"] is None
+
+
+def test_ask_borrow_from_others_is_borrowed():
+    conn = get_conn()
+    add_contact(conn, "Ali", "friend", [], "")
+    create_loan(conn, "Ali", "Wallet", 1000, "you_lent", "2025-01-10")
+    create_loan(conn, "Ali", "Wallet", 300, "you_borrowed", "2025-01-12")
+    r = ask_agent(conn, "how much I borrow from others", as_of="2025-01-20")
+    assert r["answer"] == 300.0
+
+
+def test_ask_outstanding_matches_contacts_report():
+    conn = get_conn()
+    add_contact(conn, "Ali", "friend", [], "")
+    add_contact(conn, "Zed", "other", [], "")
+    create_loan(conn, "Ali", "Wallet", 1000, "you_lent", "2025-01-10")
+    r = ask_agent(conn, "outstanding")
+    assert r["answer"] == contacts_report(conn)
+    assert r["answer"]["contacts"][1] == {"name": "Zed", "they_owe_you": 0.0, "you_owe_them": 0.0, "net": 0.0}
+
+
+def test_ask_flags_ignored_filters():
+    conn = get_conn()
+    add_contact(conn, "Ali", "friend", [], "")
+    create_loan(conn, "Ali", "Wallet", 1000, "you_lent", "2025-01-10")
+    r = ask_agent(conn, "how much did I give on food", as_of="2025-01-20")
+    assert r["answer"] == 1000.0
+    assert "ignored" in r["explanation"] and "category = 'food'" in r["explanation"]
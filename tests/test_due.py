@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+
+from onepaisa.db import SCHEMA, get_conn, get_db_path
+from onepaisa.models import (
+    DUE_LOANS_SQL,
+    add_contact,
+    create_loan,
+    repay_contact_oldest_first,
+    due_loans,
+)
+
+
+def test_due_overdue_and_upcoming():
+    conn = get_conn()
+    add_contact(conn, "Hina", "friend", [], "")
+    add_contact(conn, "Omar", "cousin", [], "")
+    create_loan(conn, "Hina", "Wallet", 1000, "you_lent", "2025-01-01", "2025-02-01")
+    create_loan(conn, "Hina", "Wallet", 300, "you_borrowed", "2025-01-02", "2025-02-02")
+    create_loan(conn, "Omar", "Wallet", 500, "you_borrowed", "2025-01-10", "2025-02-05")
+    create_loan(conn, "Hina", "Wallet", 700, "you_lent", "2025-01-15", "2025-03-30")
+    create_loan(conn, "Omar", "Wallet", 300, "you_lent", "2025-01-20")
+    rep = due_loans(conn, 7, as_of="2025-02-03")
+    assert [c["name"] for c in rep["contacts"]] == ["Hina", "Omar"]
+    assert rep["overdue_they_owe_you"] == 1000
+    assert rep["overdue_you_owe_them"] == 300
+    assert rep["upcoming_they_owe_you"] == 0
+    assert rep["upcoming_you_owe_them"] == 500
+    hina = rep["contacts"][0]
+    assert (hina["overdue_they_owe_you"], hina["overdue_you_owe_them"]) == (1000, 300)
+    assert hina["loans"][0]["days_left"] == -2
+    # closed loans drop out
+    repay_contact_oldest_first(conn, "Hina", 1000, "2025-02-03")
+    rep = due_loans(conn, 7, as_of="2025-02-03")
+    assert rep["overdue_they_owe_you"] == 0
+
+
+def test_due_negative_window_is_clamped():
+    conn = get_conn()
+    add_contact(conn, "Hina", "friend", [], "")
+    create_loan(conn, "Hina", "Wallet", 100, "you_lent", "2025-01-01", "2025-02-01")
+    rep = due_loans(conn, -5, as_of="2025-02-03")
+    assert rep["window"] == 0
+    assert rep["overdue_they_owe_you"] == 100
+
+
+def test_due_query_is_an_index_range_scan():
+    conn = get_conn()
+    plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + DUE_LOANS_SQL, ("2025-01-01",))]
+    assert any("idx_loans_open_due" in step for step in plan)
+    assert not any(step.startswith("SCAN") for step in plan)
+
+
+def test_due_rejects_and_reports_invalid_dates():
+    conn = get_conn()
+    add_contact(conn, "Hina", "friend", [], "")
+    with pytest.raises(ValueError):
+        create_loan(conn, "Hina", "Wallet", 100, "you_lent", "2025-01-01", "2025-02-30")
+    loan_id = create_loan(conn, "Hina", "Wallet", 100, "you_lent", "2025-01-01", "2025-02-01")
+    bad_id = create_loan(conn, "Hina", "Wallet", 50, "you_lent", "2025-01-01")
+    # due dates written before --due was validated
+    conn.execute("UPDATE loans SET due_date='soon' WHERE id=?", (bad_id,))
+    rep = due_loans(conn, 0, as_of="2025-02-03")
+    assert rep["invalid"] == []
+    assert rep["contacts"][0]["loans"][0]["id"] == loan_id
+    rep = due_loans(conn, 0, as_of="2025-02-03", check_invalid=True)
+    assert [i["id"] for i in rep["invalid"]] == [bad_id]
+
+
+def test_unpadded_due_dates_are_normalized_once():
+    legacy = sqlite3.connect(str(get_db_path()))
+    legacy.executescript(SCHEMA)
+    legacy.execute("INSERT INTO contacts(id,name) VALUES(1,'Hina')")
+    legacy.execute("INSERT INTO loans(contact_id,role,amount,date,due_date) VALUES(1,'you_lent',100,'2025-01-01','2025-2-1')")
+    legacy.commit()
+    legacy.close()
+    conn = get_conn()
+    assert conn.execute("SELECT due_date FROM loans").fetchone()[0] == "2025-02-01"
+    assert due_loans(conn, 0, as_of="2025-02-03")["overdue_they_owe_you"] == 100
@@ -0,0 +1,85 @@
+import json
+import sqlite3
+
+from onepaisa.db import SCHEMA, get_conn, get_db_path
+from onepaisa.models import (
+    add_contact,
+    create_loan,
+    contacts_report,
+    list_contacts,
+    list_transactions,
+    ask_agent,
+)
+
+
+def test_tag_filters():
+    conn = get_conn()
+    add_contact(conn, "Ali", "friend", ["college", "football"], "")
+    add_contact(conn, "Zara", "cousin", ["family"], "")
+    create_loan(conn, "Ali", "Wallet", 1000, "you_lent", "2025-01-01")
+    create_loan(conn, "Zara", "Wallet", 400, "you_borrowed", "2025-01-02")
+    assert [r["name"] for r in list_contacts(conn, "college")] == ["Ali"]
+    assert list_contacts(conn, "college")[0]["tag_list"].split(",") == ["college", "football"]
+    rep = contacts_report(conn, "family")
+    assert [c["name"] for c in rep["contacts"]] == ["Zara"]
+    assert rep["grand_you_owe"] == 400
+    assert [r["merchant"] for r in list_transactions(conn, "you_lent")] == ["Ali"]
+    r = ask_agent(conn, "outstanding", tag="college")
+    assert r["answer"]["grand_they_owe"] == 1000
+
+
+def test_tags_backfilled_from_json():
+    legacy = sqlite3.connect(str(get_db_path()))
+    legacy.executescript(SCHEMA)
+    legacy.execute(
+        "INSERT INTO contacts(name,relation,tags) VALUES(?,?,?)",
+        ("Sana", "friend", json.dumps(["college"])),
+    )
+    legacy.commit()
+    legacy.close()
+    conn = get_conn()
+    assert [r["name"] for r in list_contacts(conn, "college")] == ["Sana"]
+
+
+def test_backfill_skips_non_list_tags():
+    legacy = sqlite3.connect(str(get_db_path()))
+    legacy.executescript(SCHEMA)
+    legacy.execute(
+        "INSERT INTO contacts(name,relation,tags) VALUES(?,?,?)",
+        ("Sana", "friend", json.dumps("college")),
+    )
+    legacy.commit()
+    legacy.close()
+    conn = get_conn()
+    assert conn.execute("SELECT COUNT(*) FROM contact_tags").fetchone()[0] == 0
+    rep = contacts_report(conn)
+    assert rep["contacts"] == [{"name": "Sana", "they_owe_you": 0.0, "you_owe_them": 0.0, "net": 0.0}]
+
+
+def test_mixed_case_duplicate_tags_count_once():
+    conn = get_conn()
+    add_contact(conn, "Ali", "friend", ["College", "college"], "")
+    create_loan(conn, "Ali", "Wallet", 1000, "you_lent", "2025-01-01")
+    assert [r["name"] for r in list_contacts(conn, "COLLEGE")] == ["Ali"]
+    assert list_contacts(conn)[0]["tag_list"] == "College"
+    assert contacts_report(conn, "college")["grand_they_owe"] == 1000.0
+    assert len(list_transactions(conn, "YOU_LENT")) == 1
+
+
+def test_case_sensitive_tag_tables_are_folded():
+    legacy = sqlite3.connect(str(get_db_path()))
+    legacy.executescript(SCHEMA)
+    legacy.executescript(
+        "CREATE TABLE contact_tags (contact_id INTEGER NOT NULL, tag TEXT NOT NULL, PRIMARY KEY(contact_id, tag));"
+        "CREATE INDEX idx_contact_tags_tag ON contact_tags(tag, contact_id);"
+        "CREATE TABLE transaction_tags (txn_id INTEGER NOT NULL, tag TEXT NOT NULL, PRIMARY KEY(txn_id, tag));"
+        "CREATE INDEX idx_transaction_tags_tag ON transaction_tags(tag, txn_id);"
+        "INSERT INTO contacts(id,name,relation,tags) VALUES(1,'Sana','friend','[]');"
+        "INSERT INTO contact_tags VALUES(1,'College'),(1,'college');"
+        "PRAGMA user_version = 3;"
+    )
+    legacy.commit()
+    legacy.close()
+    conn = get_conn()
+    assert [r["tag"] for r in conn.execute("SELECT tag FROM contact_tags")] == ["College"]
+    assert [r["name"] for r in list_contacts(conn, "college")] == ["Sana"]